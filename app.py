@@ -5,9 +5,11 @@
 # Catatan:
 # - Letakkan road_accident_dataset.csv di folder yang sama dengan app.py (default).
 # - App ini melakukan cleaning awal otomatis (typo severity, parsing tanggal/waktu, normalisasi kategori, dedup, dll).
+# - Load pertama menulis road_accident_dataset.parquet (cache hasil parse CSV); hapus saja kalau ingin re-parse.
 
 from __future__ import annotations
 
+import os
 import re
 from pathlib import Path
 from typing import Optional, Tuple
@@ -15,6 +17,9 @@ from typing import Optional, Tuple
 import numpy as np
 import pandas as pd
 import plotly.express as px
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 import pydeck as pdk
 import streamlit as st
 
@@ -137,7 +142,8 @@ div[data-baseweb="select"] > div{
 }
 </style>
 """
-st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+# st.html: string dikirim apa adanya, tanpa lewat renderer markdown tiap rerun
+st.html(CUSTOM_CSS)
 
 px.defaults.template = "plotly_dark"
 
@@ -147,35 +153,132 @@ px.defaults.template = "plotly_dark"
 # -----------------------------
 DOW_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 SEVERITY_SCORE = {"Slight": 1, "Serious": 2, "Fatal": 3}
+SEVERITY_ORDER = ["Fatal", "Serious", "Slight"]
+_SEV_VALID = set(SEVERITY_ORDER)
+
+# Kolom yang selalu dibaca sebagai string (juga di fallback infer), parsing-nya di load_and_clean:
+# - "Accident Date": strptime pyarrow me-roll tanggal mustahil (31-02 -> 03-03), pd.to_datetime jadi NaT
+# - "Time": "HH:MM" jangan di-infer jadi time32
+CSV_STRING_COLS = {
+    "Accident Date": pa.string(),
+    "Time": pa.string(),
+}
+# Skema eksplisit CSV (nama header asli) -> parser Arrow tidak perlu menebak tipe.
+CSV_COLUMN_TYPES = {
+    "Accident_Index": pa.string(),
+    "Latitude": pa.float32(),
+    "Longitude": pa.float32(),
+    "Number_of_Casualties": pa.int16(),
+    "Number_of_Vehicles": pa.int16(),
+    "Speed_limit": pa.int16(),
+    **CSV_STRING_COLS,
+}
+
+# Kolom filter isin, urutannya sama dengan selections["filters"][1:] (index 0 = date_range)
+FILTER_COLS = [
+    "accident_severity",
+    "urban_or_rural_area",
+    "speed_limit",
+    "local_authority_district",
+    "weather_conditions",
+    "light_conditions",
+    "road_type",
+    "vehicle_type",
+]
+GEO_SAMPLE_MAX = 150_000
+RANK_TABLE_COLS = ["local_authority_district", "accidents", "severe_rate_%", "avg_severity", "avg_casualties"]
+
+# Kolom minimal per studi kasus (projection sebelum slice filter); KPI_COLS selalu ikut.
+KPI_COLS = ["accident_severity", "number_of_casualties", "number_of_vehicles"]
+CASE_COLS = {
+    "1) Tren waktu": ["accident_date"],
+    "2) Komposisi severity": ["accident_severity"],
+    "3) Pola jam × hari": ["day_of_week", "hour"],
+    "4) Speed limit vs severity": ["speed_limit", "accident_severity", "is_severe"],
+    "5) Cuaca vs severity": ["weather_conditions", "accident_severity"],
+    "6) Kondisi cahaya": ["light_conditions", "hour"],
+    "7) Road surface": ["road_surface_conditions", "accident_severity", "is_severe"],
+    "8) Vehicle type": ["vehicle_type", "accident_severity"],
+    "9) Urban vs Rural": ["urban_or_rural_area", "accident_severity", "is_severe"],
+    "10) Hotspot district + peta": [
+        "local_authority_district",
+        "accident_severity",
+        "is_severe",
+        "severity_score",
+        "number_of_casualties",
+        "accident_index",
+    ],
+}
+_NULL_TOKENS = {"", "nan", "none", "null"}
+
+# Kolom (snake_case) yang dipakai filter, KPI & studi kasus; kolom lain tidak ikut dibaca.
+USED_COLS = {
+    "accident_index",
+    "accident_date",
+    "day_of_week",
+    "accident_severity",
+    "latitude",
+    "longitude",
+    "light_conditions",
+    "local_authority_district",
+    "carriageway_hazards",
+    "number_of_casualties",
+    "number_of_vehicles",
+    "road_surface_conditions",
+    "road_type",
+    "speed_limit",
+    "time",
+    "urban_or_rural_area",
+    "weather_conditions",
+    "vehicle_type",
+}
+
+
+_NON_ALNUM = re.compile(r"[^0-9a-zA-Z]+")
+_UNDER = re.compile(r"_+")
+_UNKNOWN_RE = re.compile(r"missing|out of range", re.IGNORECASE)
+_TIME_RE = re.compile(r"^(\d{1,2}):(\d{1,2})$")
 
 
 def _snake_case(name: str) -> str:
     name = name.strip()
-    name = re.sub(r"[^0-9a-zA-Z]+", "_", name)
-    name = re.sub(r"_+", "_", name)
+    name = _NON_ALNUM.sub("_", name)
+    name = _UNDER.sub("_", name)
     return name.strip("_").lower()
 
 
-def _clean_category(x) -> str:
-    if pd.isna(x):
-        return "Unknown"
-    s = str(x).strip()
-    if s == "" or s.lower() in {"nan", "none", "null"}:
-        return "Unknown"
-    if "missing" in s.lower() or "out of range" in s.lower():
-        return "Unknown"
-    return s
+def _clean_category(s: pd.Series) -> pd.Series:
+    """Strip + ganti token kosong/null/missing/out-of-range jadi "Unknown".
 
+    Dikerjakan per level unik (dictionary-encoded), bukan per baris; hasilnya dtype category.
+    """
+    cat = s.astype("category")
+    levels = cat.cat.categories.to_series().astype("string").str.strip()
+    unknown = levels.str.lower().isin(_NULL_TOKENS) | levels.str.contains(_UNKNOWN_RE, na=False)
+    levels = levels.mask(unknown, "Unknown").to_numpy(dtype=object)
 
-def _fix_severity(x) -> str:
-    if pd.isna(x):
-        return "Unknown"
-    s = str(x).strip()
-    s_low = s.lower()
-    if s_low == "fetal":
-        return "Fatal"
-    s = s_low.capitalize()
-    return s if s in {"Fatal", "Serious", "Slight"} else "Unknown"
+    codes = cat.cat.codes.to_numpy()
+    if (codes < 0).any():
+        levels = np.append(levels, "Unknown")
+        codes = np.where(codes < 0, len(levels) - 1, codes)
+    categories, remap = np.unique(levels, return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(remap[codes], categories=categories), index=s.index, name=s.name)
+
+
+def _fix_severity(s: pd.Series) -> pd.Series:
+    """Normalisasi kapitalisasi + typo "Fetal"; nilai di luar Fatal/Serious/Slight jadi "Unknown"."""
+    s = s.astype("string").str.strip().str.lower().replace("fetal", "fatal").str.capitalize()
+    return s.where(s.isin(_SEV_VALID), "Unknown")
+
+
+def _parse_dt_cached(s: pd.Series, **kwargs) -> pd.Series:
+    """pd.to_datetime hanya untuk nilai unik lalu map balik (tanggal berulang di banyak baris)."""
+    if not pd.api.types.is_string_dtype(s):
+        # Sudah timestamp (mis. dataset lain yang kolomnya bukan string)
+        return pd.to_datetime(s, **kwargs)
+    uniq = s.dropna().unique()
+    lut = pd.Series(pd.to_datetime(pd.Series(uniq), **kwargs).to_numpy(), index=uniq)
+    return s.map(lut)
 
 
 def _style_plotly(fig):
@@ -211,31 +314,180 @@ def percent(numer: float, denom: float) -> float:
     return 0.0 if denom == 0 else 100.0 * numer / denom
 
 
-@st.cache_data(show_spinner=False)
-def load_and_clean(data_source) -> Tuple[pd.DataFrame, dict]:
-    raw = pd.read_csv(data_source)
-    stats = {"rows_raw": int(len(raw)), "cols_raw": int(raw.shape[1])}
+# Palet default HexagonLayer deck.gl (YlOrRd), dipakai untuk warna sel hasil hexbin server-side
+HEX_COLOR_RANGE = np.array(
+    [[255, 255, 178], [254, 217, 118], [254, 178, 76], [253, 141, 60], [240, 59, 32], [189, 0, 38]],
+    dtype=np.uint8,
+)
+HEX_ELEVATION_MAX = 4000
+HEX_RADIUS_MIN = 650
+# Zoom awal di-fit ke extent titik hasil filter (iframe tidak kirim balik zoom user ke server)
+MAP_ZOOM_MIN, MAP_ZOOM_MAX = 4.0, 12.0
+MAP_WIDTH_PX = 1100  # perkiraan lebar iframe (layout wide), cukup untuk fit zoom
+# elevation_scale 35 pas di overview nasional (zoom 5.4); view yang lebih dekat diskalakan turun
+# supaya tinggi kolom di layar kira-kira sama (bukan kolom 140 km di peta 1 district)
+HEX_ELEVATION_SCALE = 35
+HEX_ELEVATION_REF_ZOOM = 5.4
+# Kolom yang benar-benar dibaca accessor ColumnLayer; sisanya (accidents/weight) tidak ikut ke browser
+HEX_LAYER_COLS = ["longitude", "latitude", "elevation", "r", "g", "b"]
+MAP_HEIGHT = 720
+# Use a free public style (no Mapbox token needed); URL sama tiap render -> style & tile di-cache browser
+MAP_STYLE = "https://basemaps.cartocdn.com/gl/dark-matter-gl-style/style.json"
+
+
+def fit_hex_view(lat: np.ndarray, lon: np.ndarray) -> Tuple[float, float, float, int]:
+    """View awal (center, zoom) yang memuat semua titik + radius hexagon ~1 pixel di zoom itu.
+
+    Radius tidak pernah di bawah HEX_RADIUS_MIN: filter sempit (1 district) tetap pakai sel 650 m
+    dengan view lebih dekat; cuma overview nasional yang selnya lebih kasar.
+    """
+    lat0, lon0 = float(lat.mean()), float(lon.mean())
+    cos_lat0 = np.cos(np.deg2rad(lat0))
+    # Span simetris dari center (mean); zoom - 0.2 di bawah = margin supaya titik pinggir tidak mepet
+    span_lon = 2 * max(lon.max() - lon0, lon0 - lon.min(), 1e-3)
+    span_lat = 2 * max(lat.max() - lat0, lat0 - lat.min(), 1e-3)
+    zoom = min(
+        np.log2(MAP_WIDTH_PX * 360 / (256 * span_lon)),
+        np.log2(MAP_HEIGHT * 360 * cos_lat0 / (256 * span_lat)),
+    )
+    zoom = float(np.clip(zoom - 0.2, MAP_ZOOM_MIN, MAP_ZOOM_MAX))
+    m_per_px = 156_543.03 * cos_lat0 / 2**zoom
+    return lat0, lon0, round(zoom, 2), max(HEX_RADIUS_MIN, int(m_per_px))
+
+
+def hexbin_points(lat: np.ndarray, lon: np.ndarray, weight: np.ndarray, radius_m: float) -> pd.DataFrame:
+    """Agregasi titik ke sel hexagon (pointy-top, radius meter) di server.
+
+    Return satu baris per sel: centroid, jumlah titik, SUM weight (-> elevation) dan
+    MEAN weight (-> warna), meniru agregasi HexagonLayer tanpa mengirim titik mentah ke browser.
+    """
+    cos_lat0 = np.cos(np.deg2rad(np.mean(lat)))
+    x = lon * (111_320.0 * cos_lat0) / radius_m
+    y = lat * 110_540.0 / radius_m
+
+    # Axial coords + cube rounding
+    q = np.sqrt(3) / 3 * x - y / 3
+    r = 2 / 3 * y
+    rq, rr, rs = np.round(q), np.round(r), np.round(-q - r)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs + q + r)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq).astype(np.int64)
+    rr = np.where(fix_r, -rq - rs, rr).astype(np.int64)
+
+    # Satu key int64 per sel -> unique + bincount (tanpa hash table / groupby)
+    q0, r0 = rq.min(), rr.min()
+    span = int(rr.max() - r0) + 1
+    cells, inv = np.unique((rq - q0) * span + (rr - r0), return_inverse=True)
+    n = np.bincount(inv)
+    w_sum = np.bincount(inv, weights=weight)
+
+    cq = cells // span + q0
+    cr = cells % span + r0
+    w_mean = w_sum / n
+    lo, hi = w_mean.min(), w_mean.max()
+    n_colors = len(HEX_COLOR_RANGE)
+    color_idx = np.zeros(len(cells), dtype=np.intp)
+    if hi > lo:
+        color_idx = np.minimum(((w_mean - lo) / (hi - lo) * n_colors).astype(np.intp), n_colors - 1)
+    colors = HEX_COLOR_RANGE[color_idx]
+    # Data tipis (filter sempit) jangan langsung setinggi HEX_ELEVATION_MAX
+    elev_max = min(HEX_ELEVATION_MAX, 80 * w_sum.max())
+
+    # Payload deck dikirim sebagai JSON per baris -> bulatkan (5 desimal ~1 m) biar angkanya pendek
+    return pd.DataFrame(
+        {
+            "longitude": np.round(np.sqrt(3) * (cq + cr / 2) * radius_m / (111_320.0 * cos_lat0), 5),
+            "latitude": np.round(1.5 * cr * radius_m / 110_540.0, 5),
+            "accidents": n.astype(np.int32),
+            "weight": w_sum.astype(np.float32),
+            "elevation": np.round(elev_max * w_sum / w_sum.max(), 1),
+            "r": colors[:, 0],
+            "g": colors[:, 1],
+            "b": colors[:, 2],
+        }
+    )
+
+
+def _maybe_write_parquet(table: pa.Table, pq_path: Path) -> None:
+    """Simpan hasil parse CSV sebagai parquet (snappy) supaya run berikutnya skip parser CSV."""
+    # Tulis ke file sementara lalu os.replace (atomic): load yang ke-kill / dua proses barengan
+    # tidak meninggalkan parquet setengah jadi yang dianggap "segar".
+    tmp_path = pq_path.with_name(f"{pq_path.name}.{os.getpid()}.tmp")
+    try:
+        pq.write_table(table, tmp_path, compression="snappy")
+        os.replace(tmp_path, pq_path)
+    except OSError:
+        # Folder read-only (mis. deploy) -> tetap jalan dari CSV.
+        tmp_path.unlink(missing_ok=True)
+
+
+def _csv_convert_options(column_types: dict) -> pcsv.ConvertOptions:
+    return pcsv.ConvertOptions(
+        column_types=column_types,
+        strings_can_be_null=True,
+    )
+
 
-    df = raw.copy()
+def _read_source(path: Path) -> Tuple[pd.DataFrame, int]:
+    """Baca dataset (hanya USED_COLS) dengan dtype Arrow; prefer parquet sibling kalau masih segar."""
+    pq_path = path.with_suffix(".parquet")
+    if pq_path.exists() and pq_path.stat().st_mtime >= path.stat().st_mtime:
+        try:
+            schema = pq.read_schema(pq_path)
+            # Cache versi lama (tanggal sudah timestamp hasil parse pyarrow) -> anggap basi, parse ulang
+            if all(pa.types.is_string(schema.field(c).type) for c in CSV_STRING_COLS if c in schema.names):
+                cols = [c for c in schema.names if _snake_case(c) in USED_COLS]
+                raw = pd.read_parquet(pq_path, engine="pyarrow", columns=cols, dtype_backend="pyarrow")
+                return raw, len(schema.names)
+        except (OSError, pa.ArrowInvalid):
+            # Cache rusak (mis. sisa versi lama yang terpotong) -> parse CSV lagi, cache ditulis ulang
+            pass
+
+    read_options = pcsv.ReadOptions(block_size=64 << 20, use_threads=True)
+    try:
+        table = pcsv.read_csv(path, read_options=read_options, convert_options=_csv_convert_options(CSV_COLUMN_TYPES))
+    except pa.ArrowInvalid:
+        # Ada nilai yang tidak cocok dengan skema eksplisit -> infer saja; pd.to_numeric(coerce) di cleaning
+        table = pcsv.read_csv(path, read_options=read_options, convert_options=_csv_convert_options(CSV_STRING_COLS))
+    _maybe_write_parquet(table, pq_path)
+
+    cols_raw = table.num_columns
+    table = table.select([c for c in table.column_names if _snake_case(c) in USED_COLS])
+    # self_destruct: buffer Arrow dilepas per kolom selama konversi (peak RSS lebih rendah); table tak dipakai lagi
+    return table.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True, self_destruct=True), cols_raw
+
+
+def load_and_clean(data_source: Path) -> Tuple[pd.DataFrame, dict, dict, pd.DataFrame]:
+    df, cols_raw = _read_source(data_source)
+    stats = {"rows_raw": int(len(df)), "cols_raw": int(cols_raw)}
+
+    # Frame hasil _read_source milik kita sendiri -> tidak perlu copy sebelum cleaning
     df.columns = [_snake_case(c) for c in df.columns]
 
     # Dedup
     if "accident_index" in df.columns:
-        dup = int(df.duplicated(subset=["accident_index"]).sum())
+        # Satu pass hash: mask duplikat dipakai untuk hitung sekaligus drop (skip copy kalau bersih)
+        dup_mask = df["accident_index"].duplicated(keep="first").to_numpy()
+        dup = int(dup_mask.sum())
         stats["duplicates_accident_index"] = dup
-        df = df.drop_duplicates(subset=["accident_index"], keep="first")
+        if dup:
+            df = df.loc[~dup_mask].copy()
     else:
         stats["duplicates_accident_index"] = 0
 
     # Severity
-    df["accident_severity"] = df["accident_severity"].map(_fix_severity)
+    df["accident_severity"] = _fix_severity(df["accident_severity"])
 
     # Date/time
-    df["accident_date"] = pd.to_datetime(df["accident_date"], format="%d-%m-%Y", errors="coerce")
+    df["accident_date"] = _parse_dt_cached(df["accident_date"], format="%d-%m-%Y", errors="coerce")
     stats["date_parse_na"] = int(df["accident_date"].isna().sum())
 
-    df["time_parsed"] = pd.to_datetime(df["time"], format="%H:%M", errors="coerce")
-    df["hour"] = df["time_parsed"].dt.hour
+    # Jam dari "H:MM"/"HH:MM" (sama dengan format="%H:%M"); jam/menit di luar range jadi NA
+    hh_mm = df["time"].astype("string").str.extract(_TIME_RE)
+    hour = pd.to_numeric(hh_mm[0])
+    valid_time = (hour.le(23) & pd.to_numeric(hh_mm[1]).le(59)).fillna(False).astype(bool)
+    df["hour"] = hour.where(valid_time).astype("Int16")
 
     # Derived time features
     df["year"] = df["accident_date"].dt.year
@@ -244,7 +496,7 @@ def load_and_clean(data_source) -> Tuple[pd.DataFrame, dict]:
     df["day_name"] = df["accident_date"].dt.day_name()
 
     # Day of week (prefer column, fallback to derived)
-    df["day_of_week"] = df["day_of_week"].map(_clean_category)
+    df["day_of_week"] = _clean_category(df["day_of_week"]).astype("string")
     df.loc[df["day_of_week"].eq("Unknown"), "day_of_week"] = df["day_name"].fillna("Unknown")
     df["day_of_week"] = pd.Categorical(df["day_of_week"], categories=DOW_ORDER, ordered=True)
 
@@ -264,7 +516,7 @@ def load_and_clean(data_source) -> Tuple[pd.DataFrame, dict]:
     ]
     for c in cat_cols:
         if c in df.columns:
-            df[c] = df[c].map(_clean_category)
+            df[c] = _clean_category(df[c])
 
     # Numerics
     for c in ["number_of_casualties", "number_of_vehicles", "speed_limit", "latitude", "longitude"]:
@@ -281,17 +533,87 @@ def load_and_clean(data_source) -> Tuple[pd.DataFrame, dict]:
     else:
         stats["missing_rate_carriageway_hazards"] = 0.0
 
+    # Kolom string low-cardinality -> category (groupby/isin jalan di int codes, hemat memori)
+    for c in cat_cols + ["month"]:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    # Urutan tetap -> value_counts(sort=False) langsung keluar Fatal, Serious, Slight, Unknown
+    df["accident_severity"] = pd.Categorical(
+        df["accident_severity"], categories=SEVERITY_ORDER + ["Unknown"], ordered=True
+    )
+    # Flag Fatal/Serious sekali di sini; severe rate per grup = mean(is_severe)
+    df["is_severe"] = df["accident_severity"].isin(["Fatal", "Serious"]).to_numpy().view(np.uint8)
+
+    # Downcast angka: nilainya kecil semua, frame ini hidup lama di cache -> bytes per scan jauh lebih kecil
+    # Lewat Float64 dulu: NaN hasil coerce di kolom Arrow jadi NA (tidak bikin sum/mean NaN).
+    # downcast cuma jalan kalau semua nilai bulat & muat; data kotor (mis. 1.5, -1) tetap Float64.
+    for c in ["number_of_casualties", "number_of_vehicles"]:
+        df[c] = pd.to_numeric(df[c].astype("Float64"), downcast="unsigned")
+    df["speed_limit"] = pd.to_numeric(df["speed_limit"], downcast="integer")
+    df["severity_score"] = df["severity_score"].astype("Int8")
+    df["hour"] = df["hour"].astype("Int8")
+    df["month_num"] = df["month_num"].astype("Int8")
+    df["year"] = df["year"].astype("Int16")
+    for c in ["latitude", "longitude"]:
+        df[c] = df[c].astype("float32")
+
     stats["rows_clean"] = int(len(df))
-    return df, stats
 
+    # Opsi widget filter dihitung sekali di sini, bukan scan unique() per rerun
+    option_cols = [
+        "urban_or_rural_area",
+        "weather_conditions",
+        "light_conditions",
+        "road_type",
+        "vehicle_type",
+        "local_authority_district",
+    ]
+    filter_options = {c: df[c].cat.categories.tolist() for c in option_cols}
+    filter_options["speed_limit"] = sorted(df["speed_limit"].dropna().unique().tolist())
+    filter_options["date_min"] = df["accident_date"].min()
+    filter_options["date_max"] = df["accident_date"].max()
+
+    # Sampel koordinat untuk peta (sekali saat load); difilter ulang per rerun, bukan di-sample ulang
+    geo = df.dropna(subset=["latitude", "longitude"])
+    geo = geo.sample(min(len(geo), GEO_SAMPLE_MAX), random_state=42)
+    geo_sample = geo[["latitude", "longitude", "accident_date"] + FILTER_COLS].reset_index(drop=True)
+    # Bobot peta via lookup table di category codes (Fatal, Serious, Slight, Unknown -> 3, 2, 1, 1)
+    sev_w = np.array(
+        [SEVERITY_SCORE.get(c, 1) for c in df["accident_severity"].cat.categories], dtype=np.float32
+    )
+    geo_sample["severity_w"] = sev_w[geo["accident_severity"].cat.codes.to_numpy()]
+    return df, stats, filter_options, geo_sample
+
+
+@st.cache_resource(show_spinner=False)
+def _clean_handle(data_source: Path, mtime: float) -> Tuple[pd.DataFrame, dict, dict, pd.DataFrame]:
+    """Hasil load_and_clean dibagi antar session/rerun tanpa pickle (read-only!); mtime = key invalidasi."""
+    return load_and_clean(data_source)
 
-def apply_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+
+def filter_mask(df: pd.DataFrame, filters: tuple) -> np.ndarray:
+    """Satu mask boolean untuk semua predikat filter (cukup satu kali slice/copy di pemanggil)."""
+    date_range, *allowed_lists = filters
+    mask = np.ones(len(df), dtype=bool)
+
+    if date_range:
+        start, end = date_range
+        dates = df["accident_date"].to_numpy()
+        mask &= (dates >= np.datetime64(start)) & (dates <= np.datetime64(end))
+
+    for col, allowed in zip(FILTER_COLS, allowed_lists):
+        if allowed:
+            mask &= df[col].isin(allowed).to_numpy()
+    return mask
+
+
+def apply_filters(df: pd.DataFrame, options: dict) -> Tuple[pd.DataFrame, dict]:
     """Sidebar tanpa 'Control Panel' (biar nggak ada ruang kosong)."""
     with st.sidebar:
         st.markdown("## 🔎 Filter")
         with st.form("filters_form"):
-            dmin = df["accident_date"].min()
-            dmax = df["accident_date"].max()
+            dmin = options["date_min"]
+            dmax = options["date_max"]
             if pd.isna(dmin) or pd.isna(dmax):
                 date_range = None
                 st.info("Kolom tanggal tidak ter-parse. Filter tanggal dinonaktifkan.")
@@ -305,21 +627,20 @@ def apply_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
 
             sev = st.multiselect(
                 "Accident Severity",
-                options=["Fatal", "Serious", "Slight"],
-                default=["Fatal", "Serious", "Slight"],
+                options=SEVERITY_ORDER,
+                default=SEVERITY_ORDER,
             )
 
             urban = st.multiselect(
                 "Urban / Rural",
-                options=sorted(df["urban_or_rural_area"].dropna().unique()),
+                options=options["urban_or_rural_area"],
                 default=[],
                 help="Kosongkan untuk semua.",
             )
 
-            speed_opts = sorted(df["speed_limit"].dropna().unique().tolist())
             speed_sel = st.multiselect(
                 "Speed limit",
-                options=speed_opts,
+                options=options["speed_limit"],
                 default=[],
                 help="Kosongkan untuk semua.",
             )
@@ -327,27 +648,27 @@ def apply_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
             with st.expander("Filter lanjutan"):
                 weather = st.multiselect(
                     "Weather conditions",
-                    options=sorted(df["weather_conditions"].dropna().unique()),
+                    options=options["weather_conditions"],
                     default=[],
                 )
                 light = st.multiselect(
                     "Light conditions",
-                    options=sorted(df["light_conditions"].dropna().unique()),
+                    options=options["light_conditions"],
                     default=[],
                 )
                 road_type = st.multiselect(
                     "Road type",
-                    options=sorted(df["road_type"].dropna().unique()),
+                    options=options["road_type"],
                     default=[],
                 )
                 vehicle_type = st.multiselect(
                     "Vehicle type",
-                    options=sorted(df["vehicle_type"].dropna().unique()),
+                    options=options["vehicle_type"],
                     default=[],
                 )
                 district = st.multiselect(
                     "Local authority (district)",
-                    options=sorted(df["local_authority_district"].dropna().unique()),
+                    options=options["local_authority_district"],
                     default=[],
                 )
 
@@ -358,43 +679,23 @@ def apply_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
         st.markdown("## 🧪 Studi kasus")
         case = st.radio(
             "Pilih studi kasus",
-            options=[
-                "1) Tren waktu",
-                "2) Komposisi severity",
-                "3) Pola jam × hari",
-                "4) Speed limit vs severity",
-                "5) Cuaca vs severity",
-                "6) Kondisi cahaya",
-                "7) Road surface",
-                "8) Vehicle type",
-                "9) Urban vs Rural",
-                "10) Hotspot district + peta",
-            ],
+            options=list(CASE_COLS),
             label_visibility="collapsed",
         )
 
-    f = df.copy()
-
-    if date_range:
-        start, end = date_range
-        f = f[(f["accident_date"] >= pd.Timestamp(start)) & (f["accident_date"] <= pd.Timestamp(end))]
-
-    if sev:
-        f = f[f["accident_severity"].isin(sev)]
-    if urban:
-        f = f[f["urban_or_rural_area"].isin(urban)]
-    if speed_sel:
-        f = f[f["speed_limit"].isin(speed_sel)]
-    if district:
-        f = f[f["local_authority_district"].isin(district)]
-    if weather:
-        f = f[f["weather_conditions"].isin(weather)]
-    if light:
-        f = f[f["light_conditions"].isin(light)]
-    if road_type:
-        f = f[f["road_type"].isin(road_type)]
-    if vehicle_type:
-        f = f[f["vehicle_type"].isin(vehicle_type)]
+    filters = (
+        tuple(date_range) if date_range else None,
+        tuple(sev),
+        tuple(urban),
+        tuple(speed_sel),
+        tuple(district),
+        tuple(weather),
+        tuple(light),
+        tuple(road_type),
+        tuple(vehicle_type),
+    )
+    needed = set(KPI_COLS) | set(CASE_COLS[case])
+    f = df.loc[filter_mask(df, filters), [c for c in df.columns if c in needed]]
 
     selections = {
         "date_range": date_range,
@@ -404,10 +705,139 @@ def apply_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
         "district": district,
         "top_n_district": top_n_district,
         "case": case,
+        # Tuple hashable semua filter -> key cache agregasi (bukan isi dataframe)
+        "filters": filters,
     }
     return f, selections
 
 
+# -----------------------------
+# Cached aggregations (per studi kasus)
+# -----------------------------
+# `key` = (sumber data, mtime, selections["filters"]); `_df` (hasil filter) tidak di-hash oleh Streamlit,
+# jadi cache hit cukup membandingkan tuple kecil.
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_monthly(key: tuple, _df: pd.DataFrame) -> pd.DataFrame:
+    """Jumlah kecelakaan per bulan + moving average 3 bulan (trailing), full numpy tanpa Period."""
+    dates = _df["accident_date"].to_numpy()
+    months = dates[~np.isnat(dates)].astype("datetime64[M]")
+    month_dt, accidents = np.unique(months, return_counts=True)
+
+    csum = np.cumsum(accidents)
+    prev = np.concatenate([np.zeros(3, dtype=csum.dtype), csum])[: len(csum)]
+    ma3 = (csum - prev) / np.minimum(np.arange(1, len(csum) + 1), 3)
+    return pd.DataFrame({"month_dt": month_dt.astype("datetime64[s]"), "accidents": accidents, "ma3": ma3})
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_hour_dow(key: tuple, _df: pd.DataFrame) -> pd.DataFrame:
+    # groupby (dropna=True) sudah membuang key NA -> tidak perlu dropna(...) yang meng-copy frame
+    return (
+        _df.groupby(["day_of_week", "hour"], as_index=False, observed=True)
+        .size()
+        .rename(columns={"size": "accidents"})
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_severity_counts(key: tuple, _df: pd.DataFrame, col: str, top_n: Optional[int] = None) -> pd.DataFrame:
+    """Jumlah kecelakaan per (col, severity); top_n membatasi ke level col yang paling sering."""
+    d = _df
+    if top_n is not None:
+        top = d[col].value_counts().head(top_n).index.tolist()
+        d = d[d[col].isin(top)]
+    return (
+        d.groupby([col, "accident_severity"], as_index=False, observed=True)
+        .size()
+        .rename(columns={"size": "count"})
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_severe_rate(key: tuple, _df: pd.DataFrame, col: str) -> pd.DataFrame:
+    """Total & severe rate (Fatal + Serious) per level col via dua np.bincount (tanpa pivot_table)."""
+    codes, levels = pd.factorize(_df[col], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+    total = np.bincount(codes, minlength=len(levels))
+    severe = np.bincount(codes, weights=_df["is_severe"].to_numpy()[valid], minlength=len(levels))
+    return pd.DataFrame({col: levels, "total": total, "severe_rate_%": 100 * severe / np.maximum(total, 1)})
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_district_rank(key: tuple, _df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Ranking district per filter: (urut jumlah, urut severe rate, tabel top 50) -> semuanya ikut cache."""
+    rank = (
+        _df.groupby("local_authority_district", as_index=False, observed=True)
+        .agg(
+            accidents=("accident_index", "count"),
+            severe_rate=("is_severe", "mean"),
+            avg_severity=("severity_score", "mean"),
+            avg_casualties=("number_of_casualties", "mean"),
+        )
+    )
+    rank["severe_rate_%"] = 100 * rank["severe_rate"]
+    # FP32/int32 cukup untuk angka ranking -> buffer Arrow (tabel) & typed array plotly jadi separuh
+    rank = rank.astype(
+        {
+            "accidents": np.int32,
+            "severe_rate": np.float32,
+            "severe_rate_%": np.float32,
+            "avg_severity": np.float32,
+            "avg_casualties": np.float32,
+        }
+    )
+    rank = rank.sort_values(["accidents"], ascending=False)
+
+    # Tabel ringkas sudah jadi di sini: 50 baris -> batch Arrow ke st.dataframe kecil
+    top50 = rank[RANK_TABLE_COLS].head(50).reset_index(drop=True)
+    return rank, rank.sort_values("severe_rate_%", ascending=False), top50
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _agg_hex_cells(
+    key: tuple, _geo_sample: pd.DataFrame
+) -> Tuple[pd.DataFrame, Optional[Tuple[float, float, float, int]]]:
+    """Filter geo_sample, fit view + radius, lalu hexbin sekali per filter; rerun cuma baca sel dari cache."""
+    geo = _geo_sample.loc[filter_mask(_geo_sample, key[-1])]
+    if len(geo) == 0:
+        return pd.DataFrame(), None
+    lat = geo["latitude"].to_numpy(np.float64)
+    lon = geo["longitude"].to_numpy(np.float64)
+    view = fit_hex_view(lat, lon)
+    cells = hexbin_points(lat, lon, geo["severity_w"].to_numpy(np.float64), view[3])
+    return cells, view
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _hex_map_html(key: tuple, _cells: pd.DataFrame, view: Tuple[float, float, float, int]) -> str:
+    """Render deck peta hotspot jadi satu blob HTML standalone (dikirim lewat st.iframe)."""
+    lat0, lon0, zoom, radius_m = view
+    view_state = pdk.ViewState(latitude=lat0, longitude=lon0, zoom=zoom, pitch=45)
+
+    # Sel sudah diagregasi di server -> browser cukup menggambar kolom hexagon per sel.
+    # Tanpa picking: tooltip lama cuma teks statis, judul section sudah menjelaskan petanya.
+    hex_layer = pdk.Layer(
+        "ColumnLayer",
+        data=_cells[HEX_LAYER_COLS],
+        get_position="[longitude, latitude]",
+        radius=radius_m,
+        disk_resolution=6,
+        angle=30,
+        elevation_scale=HEX_ELEVATION_SCALE * 2 ** (HEX_ELEVATION_REF_ZOOM - zoom),
+        get_elevation="elevation",
+        get_fill_color="[r, g, b]",
+        extruded=True,
+    )
+
+    deck = pdk.Deck(
+        layers=[hex_layer],
+        initial_view_state=view_state,
+        map_style=MAP_STYLE,
+    )
+    return deck.to_html(as_string=True, notebook_display=False)
+
+
 # -----------------------------
 # Data load (no uploader)
 # -----------------------------
@@ -418,21 +848,23 @@ if not default_path.exists():
     st.error("File road_accident_dataset.csv tidak ditemukan di folder yang sama dengan app.py.")
     st.stop()
 
+data_mtime = data_source.stat().st_mtime
 with st.spinner("Memuat & cleaning dataset..."):
-    df, cleaning_stats = load_and_clean(data_source)
+    df, cleaning_stats, filter_options, geo_sample = _clean_handle(data_source, data_mtime)
 
-df_filt, selections = apply_filters(df)
+df_filt, selections = apply_filters(df, filter_options)
+agg_key = (str(data_source), data_mtime, selections["filters"])
 
 # -----------------------------
 # Hero header
 # -----------------------------
-date_min = df["accident_date"].min()
-date_max = df["accident_date"].max()
+date_min = filter_options["date_min"]
+date_max = filter_options["date_max"]
 date_range_txt = "—"
 if not pd.isna(date_min) and not pd.isna(date_max):
     date_range_txt = f"{date_min.date()} → {date_max.date()}"
 
-st.markdown(
+st.html(
     f"""
     <div class="card2">
         <div style="display:flex; align-items:center; gap:12px;">
@@ -448,8 +880,7 @@ st.markdown(
             <span style="padding:6px 10px; border:1px solid rgba(255,255,255,.12); border-radius:999px; background:rgba(255,255,255,.04); color:rgba(255,255,255,.78);">Mode: {selections["case"]}</span>
         </div>
     </div>
-    """,
-    unsafe_allow_html=True,
+    """
 )
 
 st.write("")
@@ -495,20 +926,10 @@ def _case_header(title: str, question: str):
 if case == "1) Tren waktu":
     _case_header("1) Tren kecelakaan dari waktu ke waktu", "kapan tren kecelakaan naik/turun? ada pola musiman?")
 
-    ts = (
-        df_filt.dropna(subset=["accident_date"])
-        .assign(month=lambda d: d["accident_date"].dt.to_period("M").astype(str))
-        .groupby("month", as_index=False)
-        .size()
-        .rename(columns={"size": "accidents"})
-    )
+    ts = _agg_monthly(agg_key, df_filt)
     if len(ts) == 0:
         st.info("Tidak ada data tanggal untuk divisualisasikan pada filter saat ini.")
     else:
-        ts["month_dt"] = pd.to_datetime(ts["month"] + "-01", errors="coerce")
-        ts = ts.sort_values("month_dt")
-        ts["ma3"] = ts["accidents"].rolling(3, min_periods=1).mean()
-
         fig = px.line(
             ts,
             x="month_dt",
@@ -523,11 +944,11 @@ elif case == "2) Komposisi severity":
 
     sev_counts = (
         df_filt["accident_severity"]
-        .value_counts()
-        .reindex(["Fatal", "Serious", "Slight"], fill_value=0)
-        .reset_index()
+        .value_counts(sort=False)
+        .loc[SEVERITY_ORDER]
+        .rename_axis("accident_severity")
+        .reset_index(name="count")
     )
-    sev_counts.columns = ["accident_severity", "count"]
 
     c1, c2 = st.columns([1, 1])
     with c1:
@@ -556,15 +977,10 @@ elif case == "2) Komposisi severity":
 elif case == "3) Pola jam × hari":
     _case_header("3) Pola kecelakaan berdasarkan Jam × Hari (Heatmap)", "jam dan hari mana yang paling rawan?")
 
-    hm = df_filt.dropna(subset=["hour"]).copy()
-    if len(hm) == 0:
+    heat = _agg_hour_dow(agg_key, df_filt)
+    if len(heat) == 0:
         st.info("Tidak ada data jam (time) untuk divisualisasikan pada filter saat ini.")
     else:
-        heat = (
-            hm.groupby(["day_of_week", "hour"], as_index=False)
-            .size()
-            .rename(columns={"size": "accidents"})
-        )
         fig = px.density_heatmap(
             heat,
             x="hour",
@@ -579,12 +995,7 @@ elif case == "3) Pola jam × hari":
 elif case == "4) Speed limit vs severity":
     _case_header("4) Dampak Speed Limit terhadap Severity", "apakah fatal/serious meningkat di speed limit tinggi?")
 
-    g = (
-        df_filt.dropna(subset=["speed_limit"])
-        .groupby(["speed_limit", "accident_severity"], as_index=False)
-        .size()
-        .rename(columns={"size": "count"})
-    )
+    g = _agg_severity_counts(agg_key, df_filt, "speed_limit")
     if len(g) == 0:
         st.info("Tidak ada data speed_limit pada filter saat ini.")
     else:
@@ -599,12 +1010,9 @@ elif case == "4) Speed limit vs severity":
         )
         st.plotly_chart(_style_plotly(fig), use_container_width=True)
 
-        pivot = g.pivot_table(index="speed_limit", columns="accident_severity", values="count", aggfunc="sum", fill_value=0)
-        pivot["total"] = pivot.sum(axis=1)
-        pivot["severe_rate_%"] = 100 * (pivot.get("Fatal", 0) + pivot.get("Serious", 0)) / pivot["total"]
-        pivot = pivot.reset_index().sort_values("speed_limit")
+        rate = _agg_severe_rate(agg_key, df_filt, "speed_limit")
 
-        fig2 = px.line(pivot, x="speed_limit", y="severe_rate_%", markers=True,
+        fig2 = px.line(rate, x="speed_limit", y="severe_rate_%", markers=True,
                        labels={"speed_limit": "Speed limit", "severe_rate_%": "Severe rate (%)"})
         st.plotly_chart(_style_plotly(fig2), use_container_width=True)
         st.caption("Severe rate = (Fatal + Serious) / Total, per speed limit.")
@@ -613,16 +1021,7 @@ elif case == "5) Cuaca vs severity":
     _case_header("5) Weather Conditions vs Severity", "cuaca apa yang paling sering & bagaimana severity-nya?")
 
     top_weather_n = st.slider("Top-N weather ditampilkan", 5, 20, 10, key="top_weather")
-    w = df_filt.copy()
-    w["weather_conditions"] = w["weather_conditions"].fillna("Unknown")
-    top_weather = w["weather_conditions"].value_counts().head(top_weather_n).index.tolist()
-    w = w[w["weather_conditions"].isin(top_weather)]
-
-    g = (
-        w.groupby(["weather_conditions", "accident_severity"], as_index=False)
-        .size()
-        .rename(columns={"size": "count"})
-    )
+    g = _agg_severity_counts(agg_key, df_filt, "weather_conditions", top_n=top_weather_n)
     if len(g) == 0:
         st.info("Tidak ada data cuaca pada filter saat ini.")
     else:
@@ -646,18 +1045,17 @@ elif case == "6) Kondisi cahaya":
         lc = (
             df_filt["light_conditions"]
             .value_counts()
-            .reset_index()
-            .rename(columns={"index": "light_conditions", "light_conditions": "count"})
+            .rename_axis("light_conditions")
+            .reset_index(name="count")
         )
-        lc.columns = ["light_conditions", "count"]
+        lc = lc[lc["count"] > 0]
         fig = px.bar(lc, x="light_conditions", y="count", labels={"light_conditions": "Light", "count": "Jumlah"})
         fig.update_layout(xaxis={"tickangle": -15})
         st.plotly_chart(_style_plotly(fig), use_container_width=True)
 
     with c2:
         hh = (
-            df_filt.dropna(subset=["hour"])
-            .groupby(["hour", "light_conditions"], as_index=False)
+            df_filt.groupby(["hour", "light_conditions"], as_index=False, observed=True)
             .size()
             .rename(columns={"size": "count"})
         )
@@ -671,11 +1069,7 @@ elif case == "6) Kondisi cahaya":
 elif case == "7) Road surface":
     _case_header("7) Road Surface Conditions & Severity", "permukaan jalan (dry/wet/ice) mempengaruhi severity?")
 
-    rs = (
-        df_filt.groupby(["road_surface_conditions", "accident_severity"], as_index=False)
-        .size()
-        .rename(columns={"size": "count"})
-    )
+    rs = _agg_severity_counts(agg_key, df_filt, "road_surface_conditions")
     if len(rs) == 0:
         st.info("Tidak ada data road_surface_conditions pada filter saat ini.")
     else:
@@ -691,10 +1085,7 @@ elif case == "7) Road surface":
         fig.update_layout(xaxis={"tickangle": -18})
         st.plotly_chart(_style_plotly(fig), use_container_width=True)
 
-        pv = rs.pivot_table(index="road_surface_conditions", columns="accident_severity", values="count", aggfunc="sum", fill_value=0)
-        pv["total"] = pv.sum(axis=1)
-        pv["severe_rate_%"] = 100 * (pv.get("Fatal", 0) + pv.get("Serious", 0)) / pv["total"]
-        pv = pv.reset_index().sort_values("severe_rate_%", ascending=False)
+        pv = _agg_severe_rate(agg_key, df_filt, "road_surface_conditions").sort_values("severe_rate_%", ascending=False)
 
         fig2 = px.bar(pv, x="road_surface_conditions", y="severe_rate_%", labels={"severe_rate_%": "Severe rate (%)"})
         fig2.update_layout(xaxis={"tickangle": -18})
@@ -704,15 +1095,7 @@ elif case == "8) Vehicle type":
     _case_header("8) Vehicle Type", "tipe kendaraan mana paling sering & bagaimana severity-nya?")
 
     top_vehicle_n = st.slider("Top-N vehicle ditampilkan", 5, 25, 12, key="top_vehicle")
-    v = df_filt.copy()
-    top_vehicle = v["vehicle_type"].value_counts().head(top_vehicle_n).index.tolist()
-    v = v[v["vehicle_type"].isin(top_vehicle)]
-
-    g = (
-        v.groupby(["vehicle_type", "accident_severity"], as_index=False)
-        .size()
-        .rename(columns={"size": "count"})
-    )
+    g = _agg_severity_counts(agg_key, df_filt, "vehicle_type", top_n=top_vehicle_n)
     if len(g) == 0:
         st.info("Tidak ada data vehicle_type pada filter saat ini.")
     else:
@@ -731,11 +1114,7 @@ elif case == "8) Vehicle type":
 elif case == "9) Urban vs Rural":
     _case_header("9) Urban vs Rural", "urban atau rural lebih banyak? bagaimana severe rate-nya?")
 
-    ur = (
-        df_filt.groupby(["urban_or_rural_area", "accident_severity"], as_index=False)
-        .size()
-        .rename(columns={"size": "count"})
-    )
+    ur = _agg_severity_counts(agg_key, df_filt, "urban_or_rural_area")
     if len(ur) == 0:
         st.info("Tidak ada data urban_or_rural_area pada filter saat ini.")
     else:
@@ -753,10 +1132,7 @@ elif case == "9) Urban vs Rural":
             st.plotly_chart(_style_plotly(fig), use_container_width=True)
 
         with c2:
-            pv = ur.pivot_table(index="urban_or_rural_area", columns="accident_severity", values="count", aggfunc="sum", fill_value=0)
-            pv["total"] = pv.sum(axis=1)
-            pv["severe_rate_%"] = 100 * (pv.get("Fatal", 0) + pv.get("Serious", 0)) / pv["total"]
-            pv = pv.reset_index().sort_values("severe_rate_%", ascending=False)
+            pv = _agg_severe_rate(agg_key, df_filt, "urban_or_rural_area").sort_values("severe_rate_%", ascending=False)
             fig2 = px.bar(pv, x="urban_or_rural_area", y="severe_rate_%", labels={"severe_rate_%": "Severe rate (%)", "urban_or_rural_area": "Area"})
             st.plotly_chart(_style_plotly(fig2), use_container_width=True)
 
@@ -765,20 +1141,7 @@ elif case == "10) Hotspot district + peta":
 
     top_n = selections.get("top_n_district", 15)
 
-    d = df_filt.dropna(subset=["local_authority_district"]).copy()
-    d["is_severe"] = d["accident_severity"].isin(["Fatal", "Serious"]).astype(int)
-
-    rank = (
-        d.groupby("local_authority_district", as_index=False)
-        .agg(
-            accidents=("accident_index", "count"),
-            severe_rate=("is_severe", "mean"),
-            avg_severity=("severity_score", "mean"),
-            avg_casualties=("number_of_casualties", "mean"),
-        )
-    )
-    rank["severe_rate_%"] = 100 * rank["severe_rate"]
-    rank = rank.sort_values(["accidents"], ascending=False)
+    rank, rank2, top50 = _agg_district_rank(agg_key, df_filt)
 
     c1, c2 = st.columns([1.1, 0.9])
     with c1:
@@ -795,7 +1158,6 @@ elif case == "10) Hotspot district + peta":
 
     with c2:
         st.markdown("### Ranking berdasarkan severe rate (%)")
-        rank2 = rank.sort_values("severe_rate_%", ascending=False)
         fig2 = px.bar(
             rank2.head(top_n),
             x="severe_rate_%",
@@ -807,51 +1169,22 @@ elif case == "10) Hotspot district + peta":
         st.plotly_chart(_style_plotly(fig2), use_container_width=True)
 
     st.markdown("### Peta hotspot (weighted by severity)")
-    geo = df_filt.dropna(subset=["latitude", "longitude"]).copy()
-    if len(geo) == 0:
+    cells, view = _agg_hex_cells(agg_key, geo_sample)
+    if view is None:
         st.info("Tidak ada data koordinat untuk peta pada filter saat ini.")
     else:
-        geo["severity_w"] = geo["severity_score"].fillna(1).astype(float)
-        max_points = 150_000
-        if len(geo) > max_points:
-            geo = geo.sample(max_points, random_state=42)
-
-        view_state = pdk.ViewState(
-            latitude=float(geo["latitude"].mean()),
-            longitude=float(geo["longitude"].mean()),
-            zoom=5.4,
-            pitch=45,
-        )
-
-        hex_layer = pdk.Layer(
-            "HexagonLayer",
-            data=geo,
-            get_position="[longitude, latitude]",
-            radius=650,
-            elevation_scale=35,
-            elevation_range=[0, 4000],
-            pickable=True,
-            extruded=True,
-            get_elevation_weight="severity_w",
-            elevation_aggregation="SUM",
-            get_color_weight="severity_w",
-            color_aggregation="MEAN",
-        )
-
-        # Use a free public style (no Mapbox token needed)
-        carto_dark = "https://basemaps.cartocdn.com/gl/dark-matter-gl-style/style.json"
+        # HTML deck di-cache per filter -> rerun tidak serialize ulang ribuan sel
+        map_html = _hex_map_html(agg_key, cells, view)
+        if hasattr(st, "iframe"):
+            st.iframe(map_html, height=MAP_HEIGHT)
+        else:
+            # Streamlit lama (< st.iframe): components.html sudah deprecated di versi baru, jadi import di sini saja
+            import streamlit.components.v1 as components
 
-        deck = pdk.Deck(
-            layers=[hex_layer],
-            initial_view_state=view_state,
-            map_style=carto_dark,
-            tooltip={"text": "Hex hotspot (weighted by severity)"},
-        )
-        st.pydeck_chart(deck, use_container_width=True)
+            components.html(map_html, height=MAP_HEIGHT, scrolling=False)
 
     st.markdown("### Tabel ringkas (top 50)")
-    show_cols = ["local_authority_district", "accidents", "severe_rate_%", "avg_severity", "avg_casualties"]
-    st.dataframe(rank[show_cols].head(50), use_container_width=True, hide_index=True)
+    st.dataframe(top50, use_container_width=True, hide_index=True)
 
 # -----------------------------
 # Export